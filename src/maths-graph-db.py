@@ -1,19 +1,40 @@
+import argparse
+import threading
+
 from neo4j import GraphDatabase
 
 
 class App:
 
-    def __init__(self, uri, user, pw):
+    def __init__(self, uri, user, pw, buffered = False, batch_size = 1000, flush_interval = None):
         self.driver = GraphDatabase.driver(uri, auth = (user, pw))
         self.classes = {"M": "A_level_maths", "CP": "FM_core_pure", "FP1": "FM_further_pure_1",
                         "FP2": "FM_further_pure_2",
                         "FS1": "FM_further_stats_1", "FS2": "FM_further_stats_2", "D1": "FM_decision_maths_1",
                         "D2": "FM_decision_maths_2", "Uni": "Cambridge_compsci"}
+        self.schedules = {}
+        self.subgraphs = {}
+        self.buffered = buffered
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.waves = {}
+        self.reads = {}
+        self.lock = threading.RLock()
+        self.timer = None
 
     def close(self):
-        self.driver.close()
+        try:
+            self.flush()
+        finally:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.driver.close()
 
     def delete_all(self):
+        self._clear_schedules()
+        with self.lock:
+            self._clear_pending()
         with self.driver.session() as session:
             session.write_transaction(self._delete_all)
         print("All nodes and relationships deleted")
@@ -27,6 +48,7 @@ class App:
         tx.run(query)
 
     def return_all(self):
+        self.flush()
         with self.driver.session() as session:
             result = session.write_transaction(self._return_all)
         for name in result:
@@ -42,20 +64,32 @@ class App:
 
         return [row["n"]["name"] for row in result]
 
-    def create_topic(self, name):
+    def create_topic(self, name, cls = None):
+        self._clear_schedules()
+        label = "Topic:" + self.classes[cls] if cls is not None else "Topic"
+        if self.buffered:
+            self._queue("topic", label, {"name": name}, (), name)
+            return
+
         with self.driver.session() as session:
-            session.write_transaction(self._create_topic, name)
+            session.write_transaction(self._create_topic, name, label)
         print("Topic created")
 
     @staticmethod
-    def _create_topic(tx, name):
+    def _create_topic(tx, name, label):
         query = (
-            "CREATE (:Topic { name: $name })"
+                "CREATE (:" + label + " { name: $name })"
         )
 
         tx.run(query, name = name)
 
     def create_relationships_to_one(self, *args):
+        self._clear_schedules()
+        if self.buffered:
+            for name in args[1:]:
+                self._queue("link", None, {"start": name, "end": args[0]}, (name, args[0]))
+            return
+
         with self.driver.session() as session:
             result = session.write_transaction(self._create_relationships_to_one, args)
 
@@ -86,6 +120,12 @@ class App:
         return results
 
     def create_relationships_to_many(self, *args):
+        self._clear_schedules()
+        if self.buffered:
+            for name in args[1:]:
+                self._queue("link", None, {"start": args[0], "end": name}, (args[0], name))
+            return
+
         with self.driver.session() as session:
             result = session.write_transaction(self._create_relationships_to_many, args)
 
@@ -116,6 +156,12 @@ class App:
         return results
 
     def create_relationships_consecutively(self, *args):
+        self._clear_schedules()
+        if self.buffered:
+            for i in range(len(args) - 1):
+                self._queue("link", None, {"start": args[i], "end": args[i + 1]}, (args[i], args[i + 1]))
+            return
+
         with self.driver.session() as session:
             result = session.write_transaction(self._create_relationships_consecutively, args)
 
@@ -146,6 +192,14 @@ class App:
         return results
 
     def link_sub_topics_to_one(self, *args, **kwargs):
+        self._clear_schedules()
+        if self.buffered:
+            for topic in args:
+                if topic != args[0]:
+                    self._queue("sub_topic", self.classes[kwargs["cls"]], {"start": args[0], "topic": topic},
+                                (args[0],), topic)
+            return
+
         with self.driver.session() as session:
             session.write_transaction(self._link_sub_topics_to_one, args, kwargs["cls"])
 
@@ -162,6 +216,13 @@ class App:
                 tx.run(query, start = topics[0], topic = topic)
 
     def link_sub_topics_consecutively(self, *args, **kwargs):
+        self._clear_schedules()
+        if self.buffered:
+            for name in range(len(args) - 1):
+                self._queue("sub_topic", self.classes[kwargs["cls"]], {"start": args[name], "topic": args[name + 1]},
+                            (args[name],), args[name + 1])
+            return
+
         with self.driver.session() as session:
             session.write_transaction(self._link_sub_topics_consecutively, args, kwargs["cls"])
 
@@ -177,6 +238,8 @@ class App:
             tx.run(query, start = path[name], topic = path[name + 1])
 
     def rename_node(self, name, new_name, cls):
+        self.flush()
+        self._clear_schedules()
         with self.driver.session() as session:
             session.write_transaction(self._rename_node, name, new_name, cls)
 
@@ -190,9 +253,227 @@ class App:
 
         tx.run(query, name = name, new_name = new_name)
 
+    def study_order(self, root, *classes):
+        return [name for layer in self.study_schedule(root, *classes) for name in layer]
+
+    def study_schedule(self, root, *classes):
+        self.flush()
+        for cls in classes:
+            if cls not in self.classes:
+                raise ValueError(f"Unknown curriculum {cls}, expected one of {', '.join(self.classes)}")
+
+        key = (root, frozenset(classes))
+        if key not in self.schedules:
+            if key[1] not in self.subgraphs:
+                labels = [self.classes[cls] for cls in classes] if classes else None
+                with self.driver.session() as session:
+                    self.subgraphs[key[1]] = session.read_transaction(self._study_schedule, labels,
+                                                                      list(self.classes.values()))
+            names, graph = self.subgraphs[key[1]]
+            roots = [node for node, name in names.items() if name == root]
+            if not roots:
+                raise ValueError(f"No topic named {root} in {', '.join(classes) or 'any curriculum'}")
+            self.schedules[key] = self._layer(self._reachable(graph, roots), names)
+
+        return self.schedules[key]
+
+    @staticmethod
+    def _study_schedule(tx, labels, curricula):
+        # fetch every node the walk may visit with its edges, the walk itself is done in _reachable. topics
+        # created without a curriculum carry none of the curriculum labels and are kept under every filter
+        query = (
+            "MATCH (n) WHERE $labels IS NULL OR any(label IN labels(n) WHERE label IN $labels) "
+            "OR none(label IN labels(n) WHERE label IN $curricula) "
+            "RETURN id(n) AS id, n.name AS name, [(n)-[:RELATED_TO]->(m) | id(m)] AS next"
+        )
+
+        result = tx.run(query, labels = labels, curricula = curricula)
+
+        names = {}
+        graph = {}
+        for row in result:
+            names[row["id"]] = row["name"]
+            graph[row["id"]] = row["next"]
+
+        return names, graph
+
+    @staticmethod
+    def _reachable(graph, roots):
+        reached = {root: graph[root] for root in roots}
+        stack = list(roots)
+        while stack:
+            for node in graph[stack.pop()]:
+                if node in graph and node not in reached:
+                    reached[node] = graph[node]
+                    stack.append(node)
+
+        return {node: [next_node for next_node in nodes if next_node in reached] for node, nodes in reached.items()}
 
-def create_probability_uni():
-    app.create_topic("Probability/Cambridge_compsci")
+    @staticmethod
+    def _layer(graph, names):
+        in_degree = dict.fromkeys(graph, 0)
+        for nodes in graph.values():
+            for node in nodes:
+                in_degree[node] += 1
+
+        layers = []
+        layer = [node for node, degree in in_degree.items() if degree == 0]
+        while layer:
+            layers.append(tuple(sorted(names[node] for node in layer)))
+            next_layer = []
+            for node in layer:
+                for next_node in graph[node]:
+                    in_degree[next_node] -= 1
+                    if in_degree[next_node] == 0:
+                        next_layer.append(next_node)
+            layer = next_layer
+
+        blocked = {node for node, degree in in_degree.items() if degree > 0}
+        if blocked:
+            cycles = App._cycles(graph, blocked)
+            raise ValueError("Cycle detected between " +
+                             "; ".join(", ".join(sorted(names[node] for node in cycle)) for cycle in cycles))
+
+        return tuple(layers)
+
+    @staticmethod
+    def _cycles(graph, blocked):
+        # Tarjan's strongly connected components over the blocked nodes, without recursion
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+
+        for start in blocked:
+            if start in index:
+                continue
+            index[start] = low[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(graph[start]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in blocked:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(graph[child])))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1 or node in graph[node]:
+                            cycles.append(component)
+
+        return cycles
+
+
+    def _clear_schedules(self):
+        self.schedules.clear()
+        self.subgraphs.clear()
+
+    def _queue(self, kind, label, row, after, creates = None):
+        with self.lock:
+            # a row waits for the wave after every pending node it matches on, and a node waits for the wave
+            # after every pending row that matches on its name
+            wave = max((self.waves.get(name, -1) for name in after), default = -1) + 1
+            for name in after:
+                self.reads[name] = max(self.reads.get(name, wave), wave)
+            if creates is not None:
+                wave = max(wave, self.reads.get(creates, -1) + 1)
+                self.waves[creates] = max(self.waves.get(creates, wave), wave)
+
+            self.pending.append((wave, kind, label, row))
+
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            elif self.flush_interval is not None and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _clear_pending(self):
+        self.pending = []
+        self.waves = {}
+        self.reads = {}
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+
+            groups = {}
+            for wave, kind, label, row in self.pending:
+                groups.setdefault((wave, kind, label), []).append(row)
+            count = len(self.pending)
+
+            with self.driver.session() as session:
+                result = session.write_transaction(self._flush, sorted(groups.items(), key = lambda group: group[0]))
+            self._clear_pending()
+
+        print(f"{count} writes flushed in {len(groups)} statements")
+        for row in result:
+            print(f"Relationship unable to be created between {row[0]} and {row[1]}")
+
+    @staticmethod
+    def _flush(tx, groups):
+        missing = []
+
+        for (_, kind, label), rows in groups:
+            if kind == "topic":
+                query = (
+                        "UNWIND $rows AS row "
+                        "CREATE (:" + label + " { name: row.name })"
+                )
+
+                tx.run(query, rows = rows)
+            elif kind == "sub_topic":
+                query = (
+                        "UNWIND $rows AS row "
+                        "MATCH (t1) WHERE t1.name = row.start "
+                        "CREATE (t1)-[:RELATED_TO]->(t2:" + label + " { name: row.topic }) "
+                )
+
+                tx.run(query, rows = rows)
+            else:
+                query = (
+                    "UNWIND $rows AS row "
+                    "MATCH (n1) WHERE n1.name = row.start "
+                    "MATCH (n2) WHERE n2.name = row.end "
+                    "CREATE (n1)-[:RELATED_TO]->(n2) "
+                    "RETURN row.start AS start, row.end AS end"
+                )
+
+                result = tx.run(query, rows = rows)
+                found = {(row["start"], row["end"]) for row in result}
+                missing.extend((row["start"], row["end"]) for row in rows if (row["start"], row["end"]) not in found)
+
+        return missing
+
+def create_probability_uni(app):
+    app.create_topic("Probability/Cambridge_compsci", cls = "Uni")
     app.link_sub_topics_to_one("Probability/Cambridge_compsci", "Counting/Combinatorics", "Probability space", "Axioms",
                                "Union bound", "Conditional probability", "Discrete random variables",
                                "Moments and Limit Theorems", "Statistics", cls = "Uni")
@@ -220,15 +501,15 @@ def create_probability_uni():
                                cls = "Uni")
 
 
-def create_central_limit_theorem_fs1():
-    app.create_topic("Central limit theorem")
+def create_central_limit_theorem_fs1(app):
+    app.create_topic("Central limit theorem", cls = "FS1")
     app.link_sub_topics_consecutively("Central limit theorem", "The central limit theorem",
                                       "Applying to other distributions",
                                       cls = "FS1")
 
 
-def create_measures_of_location_and_spread_maths():
-    app.create_topic("Measures of location and spread/A_level")
+def create_measures_of_location_and_spread_maths(app):
+    app.create_topic("Measures of location and spread/A_level", cls = "M")
     app.link_sub_topics_to_one("Measures of location and spread/A_level", "Measures of central tendency",
                                "Measures of spread", "Coding", cls = "M")
     app.link_sub_topics_consecutively("Measures of central tendency", "Other measures of location", cls = "M")
@@ -237,23 +518,23 @@ def create_measures_of_location_and_spread_maths():
     app.link_sub_topics_to_one("Measures of central tendency", "Mode", "Median", "Mean", cls = "M")
 
 
-def create_probability_maths():
-    app.create_topic("Probability/A_level")
+def create_probability_maths(app):
+    app.create_topic("Probability/A_level", cls = "M")
     app.link_sub_topics_to_one("Probability/A_level", "Calculating probabilities", "Tree diagrams", cls = "M")
     app.link_sub_topics_consecutively("Calculating probabilities", "Venn diagrams",
                                       "Mutually exclusive and independent events", cls = "M")
 
 
-def create_statistical_distributions_maths():
-    app.create_topic("Statistical Distributions/A_level")
+def create_statistical_distributions_maths(app):
+    app.create_topic("Statistical Distributions/A_level", cls = "M")
     app.link_sub_topics_consecutively("Statistical Distributions/A_level", "Probability distributions/A_level",
                                       "Binomial distribution", "Cumulative probabilities", cls = "M")
     app.link_sub_topics_to_one("Probability distributions/A_level", "Sample space", "Probability mass function/A_level",
                                cls = "M")
 
 
-def create_conditional_probability_maths():
-    app.create_topic("Conditional probability/A_level")
+def create_conditional_probability_maths(app):
+    app.create_topic("Conditional probability/A_level", cls = "M")
     app.link_sub_topics_to_one("Conditional probability/A_level", "Set notation", "Conditional probability (sub_topic)",
                                cls = "M")
     app.link_sub_topics_to_one("Conditional probability (sub_topic)", "Venn diagrams with conditional probability",
@@ -261,8 +542,8 @@ def create_conditional_probability_maths():
     app.create_relationships_consecutively("Conditional probability/A_level", "Tree diagrams")
 
 
-def create_normal_distribution_a_lvl():
-    app.create_topic("Normal distribution/A_level")
+def create_normal_distribution_a_lvl(app):
+    app.create_topic("Normal distribution/A_level", cls = "M")
     app.link_sub_topics_to_one("Normal distribution/A_level", "The normal distribution",
                                "The inverse normal distribution function",
                                "The standard normal distribution", cls = "M")
@@ -271,8 +552,8 @@ def create_normal_distribution_a_lvl():
                                "Hypothesis testing with the normal distribution", cls = "M")
 
 
-def create_discrete_random_variables_fs1():
-    app.create_topic("Discrete random variables/A_level")
+def create_discrete_random_variables_fs1(app):
+    app.create_topic("Discrete random variables/A_level", cls = "FS1")
     app.link_sub_topics_to_one("Discrete random variables/A_level", "Expected value of a discrete random variable",
                                "Variance of a discrete random variable", cls = "FS1")
     app.link_sub_topics_consecutively("Variance of a discrete random variable",
@@ -281,9 +562,9 @@ def create_discrete_random_variables_fs1():
                                            "Expected value and variance of a function of X")
 
 
-def create_more_distributions_fs1():
-    app.create_topic("Poisson distributions")
-    app.create_topic("Geometric and negative binomial distributions")
+def create_more_distributions_fs1(app):
+    app.create_topic("Poisson distributions", cls = "FS1")
+    app.create_topic("Geometric and negative binomial distributions", cls = "FS1")
     app.link_sub_topics_to_one("Poisson distributions", "The Poisson distribution", cls = "FS1")
     app.link_sub_topics_to_one("Geometric and negative binomial distributions", "The geometric distribution",
                                "The negative binomial distribution", cls = "FS1")
@@ -291,21 +572,21 @@ def create_more_distributions_fs1():
                                cls = "FS1")
 
 
-def create_proof_maths():
-    app.create_topic("Proof/A_level")
+def create_proof_maths(app):
+    app.create_topic("Proof/A_level", cls = "M")
     app.link_sub_topics_to_one("Proof/A_level", "Proof by exhaustion", "Proof by contradiction/A_level",
                                "Proof by deduction", "Proof by counterexample", cls = "M")
     app.link_sub_topics_consecutively("Proof by contradiction/A_level", "Negation/A_level", cls = "M")
 
 
-def create_proof_by_induction_cp():
-    app.create_topic("Proof by induction")
+def create_proof_by_induction_cp(app):
+    app.create_topic("Proof by induction", cls = "CP")
     app.link_sub_topics_to_one("Proof by induction", "Proof by mathematical induction", "Proving divisibility results",
                                "Proving statements involving matrices", cls = "CP")
 
 
-def create_proof_uni():
-    app.create_topic("Proof/Cambridge_compsci")
+def create_proof_uni(app):
+    app.create_topic("Proof/Cambridge_compsci", cls = "Uni")
     app.link_sub_topics_to_one("Proof/Cambridge_compsci", "Mathematical statements", "Divisibility and congruences",
                                "Fermat's Little Theorem", "Proof by contradiction",
                                "Proofs in practice and mathematical jargon", "Logical deduction", cls = "Uni")
@@ -316,8 +597,8 @@ def create_proof_uni():
                                       "Disjunction", "Negation", cls = "Uni")
 
 
-def create_number_theory_uni():
-    app.create_topic("Number theory/Cambridge_compsci")
+def create_number_theory_uni(app):
+    app.create_topic("Number theory/Cambridge_compsci", cls = "Uni")
     app.link_sub_topics_to_one("Number theory/Cambridge_compsci", "Number systems",
                                "The division theorem and algorithm",
                                "Modular arithmetic", "Sets", "The greatest common divisor",
@@ -332,8 +613,8 @@ def create_number_theory_uni():
                                       "Fundamental Theorem of Arithmetic", "Euclid's infinity primes", cls = "Uni")
 
 
-def create_number_theory_fp2():
-    app.create_topic("Number theory/A_level")
+def create_number_theory_fp2(app):
+    app.create_topic("Number theory/A_level", cls = "FP2")
     app.link_sub_topics_to_one("Number theory/A_level", "The division algorithm", "The Euclidean algorithm",
                                "Divisibility tests", "Modular arithmetic/A_level", "Fermat's Little Theorem/A_level",
                                "Combinatorics", cls = "FP2")
@@ -341,14 +622,14 @@ def create_number_theory_fp2():
     app.link_sub_topics_to_one("Combinatorics", "Subsets", "The empty set/A_level", cls = "FP2")
 
 
-def create_continuous_distributions_fs2():
-    app.create_topic("Continuous distributions/A_level")
+def create_continuous_distributions_fs2(app):
+    app.create_topic("Continuous distributions/A_level", cls = "FS2")
     app.link_sub_topics_to_one("Continuous distributions/A_level", "Continuous random variables",
                                "The cumulative distribution function", cls = "FS2")
 
 
-def create_algorithms_uni():
-    app.create_topic("Algorithms")
+def create_algorithms_uni(app):
+    app.create_topic("Algorithms", cls = "Uni")
     app.link_sub_topics_to_one("Algorithms", "Sorting", "Strategies for algorithm design", "Data structures",
                                "Graph algorithms", "Advanced data structures", "Geometric algorithms", cls = "Uni")
 
@@ -373,8 +654,8 @@ def create_algorithms_uni():
     app.link_sub_topics_to_one("Maximum flow", "Ford-Fulkerson method", "Max-Flow Min-Cut Theorem", cls = "Uni")
 
 
-def create_advanced_algorithms_uni():
-    app.create_topic("Advanced algorithms")
+def create_advanced_algorithms_uni(app):
+    app.create_topic("Advanced algorithms", cls = "Uni")
     app.link_sub_topics_to_one("Advanced algorithms", "Linear programming", "Approximation algorithms", cls = "Uni")
 
     app.link_sub_topics_to_one("Linear programming", "Definitions and applications", "Formulating linear programs",
@@ -388,34 +669,34 @@ def create_advanced_algorithms_uni():
                                       "Hardness of approximation", cls = "Uni")
 
 
-def create_business_studies():
-    app.create_topic("Business studies")
+def create_business_studies(app):
+    app.create_topic("Business studies", cls = "Uni")
     app.link_sub_topics_to_one("Business studies", "Project planning and management", cls = "Uni")
     app.link_sub_topics_consecutively("Project planning and management", "Role of a manager", "PERT and GANTT charts",
                                       "Critical path analysis", "Estimation techniques", "Monitoring", cls = "Uni")
 
 
-def create_game_theory_and_game_playing():
-    app.create_topic("Game theory")
+def create_game_theory_and_game_playing(app):
+    app.create_topic("Game theory", cls = "Uni")
     app.link_sub_topics_to_one("Game theory", "Choice between cooperation and conflict", "Prisoners' Dilemma",
                                cls = "Uni")
     app.link_sub_topics_consecutively("Prisoners' Dilemma", "Nash equilibrium", "Hawk-dove", "Iterated games",
                                       "Evolution of strategies", "Application to biology and computer science",
                                       cls = "Uni")
 
-    app.create_topic("Game-playing")
+    app.create_topic("Game-playing", cls = "Uni")
     app.link_sub_topics_consecutively("Game-playing", "Search in an adversarial environment",
                                       "The minimax algorithm and its shortcomings",
                                       "Improving minimax using alpha-beta pruning", cls = "Uni")
 
 
-def create_decision_maths_1():
-    app.create_topic("Algorithms/A_level")
+def create_decision_maths_1(app):
+    app.create_topic("Algorithms/A_level", cls = "D1")
     app.link_sub_topics_to_one("Algorithms/A_level", "Using and understanding algorithms", "Bubble sort",
                                "Quick sort/A_level",
                                "Bin-packing algorithms", "Order of an algorithm", cls = "D1")
 
-    app.create_topic("Graphs and networks")
+    app.create_topic("Graphs and networks", cls = "D1")
     app.link_sub_topics_to_one("Graphs and networks", "Modelling with graphs", "Graph theory",
                                "The planarity algorithm",
                                cls = "D1")
@@ -424,12 +705,12 @@ def create_decision_maths_1():
                                cls = "D1")
     app.create_relationships_consecutively("Modelling with graphs", "Graph theory")
 
-    app.create_topic("Algorithms on graphs")
+    app.create_topic("Algorithms on graphs", cls = "D1")
     app.link_sub_topics_to_one("Algorithms on graphs", "Kruskal's algorithm", "Prim's algorithm",
                                "Dijkstra's algorithm to find shortest path", "Floyd's algorithm", cls = "D1")
     app.link_sub_topics_consecutively("Prim's algorithm", "Applying Prim's algorithm to a distance matrix", cls = "D1")
 
-    app.create_topic("The travelling salesman problem")
+    app.create_topic("The travelling salesman problem", cls = "D1")
     app.link_sub_topics_to_one("The travelling salesman problem",
                                "Classical and practical travelling salesman problems",
                                cls = "D1")
@@ -438,19 +719,19 @@ def create_decision_maths_1():
                                "Using minimum spanning tree method to find a lower bound",
                                "Using nearest neighbour algorithm to find an upper bound", cls = "D1")
 
-    app.create_topic("Linear programming/A_level")
+    app.create_topic("Linear programming/A_level", cls = "D1")
     app.link_sub_topics_to_one("Linear programming/A_level", "Linear programming problems", cls = "D1")
     app.link_sub_topics_to_one("Linear programming problems", "Graphical methods", "Locating the optimal point",
                                "Solutions with integer values",
                                cls = "D1")
 
-    app.create_topic("The simplex algorithm/A_level")
+    app.create_topic("The simplex algorithm/A_level", cls = "D1")
     app.link_sub_topics_to_one("The simplex algorithm/A_level", "Formulating linear programming problems",
                                "The simplex method",
                                "Problems requiring integer solutions", "The Big-M method", cls = "D1")
     app.link_sub_topics_consecutively("The simplex method", "Two-stage simplex method", cls = "D1")
 
-    app.create_topic("Critical path analysis/A_level")
+    app.create_topic("Critical path analysis/A_level", cls = "D1")
     app.link_sub_topics_to_one("Critical path analysis/A_level", "Modelling a project", "Dummy activities",
                                "Gantt charts",
                                "Resource histograms", "Scheduling diagrams", cls = "D1")
@@ -458,20 +739,20 @@ def create_decision_maths_1():
                                "The float of an activity", cls = "D1")
 
 
-def create_decision_maths_2():
-    app.create_topic("Transportation problems")
+def create_decision_maths_2(app):
+    app.create_topic("Transportation problems", cls = "D2")
     app.link_sub_topics_to_one("Transportation problems", "The north-west corner method",
                                "Unbalanced problems and degenerate solutions",
                                "Linear programming with transportation problems", cls = "D2")
     app.link_sub_topics_consecutively("Unbalanced problems and degenerate solutions", "Finding an improved solution",
                                       "The stepping-stone method", cls = "D2")
 
-    app.create_topic("Allocation problems")
+    app.create_topic("Allocation problems", cls = "D2")
     app.link_sub_topics_to_one("Allocation problems", "The Hungarian algorithm", "Using a dummy",
                                "Maximum profit allocation",
                                "Managing incomplete data", "Linear programming with allocation problems", cls = "D2")
 
-    app.create_topic("Flows in networks")
+    app.create_topic("Flows in networks", cls = "D2")
     app.link_sub_topics_to_one("Flows in networks", "Flows in networks (sub topic)", "Cuts and their capacities",
                                "Finding an initial flow", cls = "D2")
     app.link_sub_topics_consecutively("Finding an initial flow", "Flow-augmenting routes",
@@ -479,13 +760,13 @@ def create_decision_maths_2():
     app.link_sub_topics_to_one("Cuts and their capacities", "Lower capacities", "Sources and sinks",
                                "Restricted capacity nodes", cls = "D2")
 
-    app.create_topic("Dynamic programming/A_level")
+    app.create_topic("Dynamic programming/A_level", cls = "D2")
     app.link_sub_topics_to_one("Dynamic programming/A_level", "Shortest and longest path problems",
                                "Dynamic programming problems in table form", cls = "D2")
     app.link_sub_topics_consecutively("Shortest and longest path problems", "Minimax and maximin problems", cls = "D2")
     app.link_sub_topics_to_one("Shortest and longest path problems", "Bellman's principle of optimality", cls = "D2")
 
-    app.create_topic("Game theory/A_level")
+    app.create_topic("Game theory/A_level", cls = "D2")
     app.link_sub_topics_to_one("Game theory/A_level", "Play-safe strategies and stable solutions",
                                "Converting games to linear programming problems", cls = "D2")
     app.link_sub_topics_to_one("Play-safe strategies and stable solutions", "Reducing the pay-off matrix",
@@ -494,8 +775,8 @@ def create_decision_maths_2():
                                       cls = "D2")
 
 
-def create_sets_uni():
-    app.create_topic("Set theory")
+def create_sets_uni(app):
+    app.create_topic("Set theory", cls = "Uni")
     app.link_sub_topics_to_one("Set theory", "Extensionality axiom", "Separation principle", "Powerset axiom",
                                "Pairing axiom",
                                "Union axiom", "Relations", "Partial and (total) functions", "Bijections",
@@ -519,20 +800,20 @@ def create_sets_uni():
                                       "Unbounded cardinality", "Diagonalisation", "Fixed points", cls = "Uni")
 
 
-def create_flow_control_uni():
-    app.create_topic("Flow control and resource optimisation")
+def create_flow_control_uni(app):
+    app.create_topic("Flow control and resource optimisation", cls = "Uni")
     app.link_sub_topics_to_one("Flow control and resource optimisation", "Control theory", "Stemming the flood",
                                "Optimisation as a model of network and user")
 
 
-def create_matrix_algebra_fp2():
-    app.create_topic("Matrix algebra")
+def create_matrix_algebra_fp2(app):
+    app.create_topic("Matrix algebra", cls = "FP2")
     app.link_sub_topics_to_one("Matrix algebra", "Eigenvalues and eigenvectors", "Reducing matrices to diagonal form",
                                "The Cayley-Hamilton theorem", cls = "FP2")
 
 
-def create_matrices_cp():
-    app.create_topic("Matrices/A_level")
+def create_matrices_cp(app):
+    app.create_topic("Matrices/A_level", cls = "CP")
     app.link_sub_topics_to_one("Matrices/A_level", "Introduction to matrices", "Matrix multiplication/A_level",
                                "Determinants", cls = "CP")
     app.link_sub_topics_to_one("Determinants", "Inverting a 2 x 2 matrix", "Inverting a 3 x 3 matrix", cls = "CP")
@@ -540,16 +821,19 @@ def create_matrices_cp():
                                       cls = "CP")
 
 
-def create_the_binomial_expansion_maths():
-    app.create_topic("The binomial expansion")
+def create_the_binomial_expansion_maths(app):
+    app.create_topic("The binomial expansion", cls = "M")
     app.link_sub_topics_to_one("The binomial expansion", "Pascal's triangle/A_level", "Factorial notation",
                                "Binomial estimation", cls = "M")
     app.link_sub_topics_consecutively("Pascal's triangle/A_level", "The binomial expansion (sub topic)", cls = "M")
     app.create_relationships_consecutively("Factorial notation", "The binomial expansion (sub topic)")
 
 
-def link_all():
-    # link compulsory maths
+def link_maths(app):
+    app.create_relationships_consecutively("Venn diagrams", "Venn diagrams with conditional probability")
+
+
+def link_maths_uni(app):
     app.create_relationships_consecutively("Proof by contradiction/A_level", "Proof by contradiction")
     app.create_relationships_consecutively("Negation/A_level", "Negation")
     app.create_relationships_consecutively("Conditional probability/A_level", "Conditional probability")
@@ -565,58 +849,76 @@ def link_all():
     app.create_relationships_consecutively("Proof by deduction", "Logical deduction")
     app.create_relationships_to_one("Binomial Theorem", "The binomial expansion (sub topic)", "Binomial distribution")
     app.create_relationships_consecutively("Pascal's triangle/A_level", "Pascal's Triangle")
-    app.create_relationships_consecutively("Venn diagrams", "Venn diagrams with conditional probability",
-                                           "Venn and Hasse diagrams")
+    app.create_relationships_consecutively("Venn diagrams with conditional probability", "Venn and Hasse diagrams")
+    app.create_relationships_consecutively("Normal and exponential distributions", "The normal distribution")
+
 
-    # link compulsory further maths
+def link_cp_uni(app):
     app.create_relationships_to_many("Matrices/A_level", "Matrices")
     app.create_relationships_consecutively("Matrix multiplication/A_level", "Matrix multiplication")
     app.create_relationships_consecutively("Proof by mathematical induction", "Mathematical induction")
 
-    # link further pure 1
-    app.create_relationships_consecutively("Reducing matrices to diagonal form", "Diagonalisation")
 
-    # link further pure 2
+def link_fp2_maths(app):
+    app.create_relationships_to_many("Fermat's Little Theorem/A_level", "Proof/A_level")
+    app.create_relationships_to_many("Solving congruence equations", "Proof/A_level")
+
+
+def link_fp2_uni(app):
+    app.create_relationships_consecutively("Reducing matrices to diagonal form", "Diagonalisation")
     app.create_relationships_consecutively("The Euclidean algorithm", "Euclid's Algorithm and Theorem")
     app.create_relationships_consecutively("Modular arithmetic/A_level", "Modular arithmetic")
-    app.create_relationships_to_many("Fermat's Little Theorem/A_level", "Fermat's Little Theorem", "Proof/A_level")
-    app.create_relationships_to_many("Solving congruence equations", "Proof/A_level", "Divisibility and congruences")
+    app.create_relationships_to_many("Fermat's Little Theorem/A_level", "Fermat's Little Theorem")
+    app.create_relationships_to_many("Solving congruence equations", "Divisibility and congruences")
     app.create_relationships_consecutively("Combinatorics", "Counting/Combinatorics")
     app.create_relationships_consecutively("The division algorithm", "The division theorem and algorithm")
     app.create_relationships_consecutively("Subsets", "Subsets and supersets")
     app.create_relationships_consecutively("The empty set/A_level", "The empty set")
 
-    # link further stats 1
+
+def link_fs1(app):
+    app.create_relationships_to_one("Mean and variance", "The geometric distribution",
+                                    "The negative binomial distribution")
+    app.create_relationships_to_many("Applying to other distributions", "The Poisson distribution",
+                                     "The geometric distribution", "The negative binomial distribution")
+
+
+def link_fs1_maths(app):
+    app.create_relationships_to_one("Mean and variance", "Binomial distribution")
+    app.create_relationships_consecutively("Binomial distribution", "The negative binomial distribution")
+    app.create_relationships_to_many("Applying to other distributions", "Binomial distribution")
+
+
+def link_fs1_uni(app):
     app.create_relationships_consecutively("Discrete random variables/A_level", "Discrete random variables")
     app.create_relationships_consecutively("Expected value and variance of a function of X", "Variance")
-    app.create_relationships_consecutively("Normal and exponential distributions", "The normal distribution")
     app.create_relationships_to_one("Expected value of a discrete random variable", "Expectation", "Random variables")
-    app.create_relationships_to_one("Mean and variance", "Binomial distribution", "The geometric distribution",
-                                    "The negative binomial distribution", "Variance", "Continuous distributions")
-    app.create_relationships_consecutively("Binomial distribution", "The negative binomial distribution")
-    app.create_relationships_to_many("Applying to other distributions", "The Poisson distribution",
-                                     "The geometric distribution",
-                                     "Binomial distribution", "The negative binomial distribution")
+    app.create_relationships_to_one("Mean and variance", "Variance", "Continuous distributions")
     app.create_relationships_consecutively("The Poisson distribution", "Poisson")
     app.create_relationships_consecutively("The geometric distribution", "Geometric")
     app.create_relationships_consecutively("The central limit theorem", "Central Limit Theorem")
     app.create_relationships_consecutively("Expected value and variance of a function of X",
                                            "Definition and properties of expectation")
 
-    # link further stats 2
+
+def link_fs2_uni(app):
     app.create_relationships_consecutively("The cumulative distribution function", "Cumulative distribution")
     app.create_relationships_consecutively("Continuous random variables", "Continuous distributions")
 
-    # decision maths 1 and 2
-    app.create_relationships_consecutively("Linear programming/A_level", "Linear programming",
-                                           "Solving TSP with linear programming")
-    app.create_relationships_to_one("Definitions and applications", "Linear programming with transportation problems",
-                                    "Linear programming with allocation problems",
-                                    "Converting games to linear programming problems")
-    app.create_relationships_consecutively("Solutions with integer values", "Problems requiring integer solutions",
-                                           "Finding initial solutions")
-    app.create_relationships_consecutively("Linear programming problems", "Formulating linear programming problems",
-                                           "Formulating linear programs")
+
+def link_uni(app):
+    app.create_relationships_consecutively("Linear programming", "Solving TSP with linear programming")
+
+
+def link_d1(app):
+    app.create_relationships_consecutively("Solutions with integer values", "Problems requiring integer solutions")
+    app.create_relationships_consecutively("Linear programming problems", "Formulating linear programming problems")
+
+
+def link_d1_uni(app):
+    app.create_relationships_consecutively("Linear programming/A_level", "Linear programming")
+    app.create_relationships_consecutively("Problems requiring integer solutions", "Finding initial solutions")
+    app.create_relationships_consecutively("Formulating linear programming problems", "Formulating linear programs")
     app.create_relationships_consecutively("Bubble sort", "Sorting algorithms of quadratic complexity")
     app.create_relationships_consecutively("Quick sort/A_level", "Quick sort")
     app.create_relationships_consecutively("Using and understanding algorithms", "Algorithms")
@@ -624,12 +926,18 @@ def link_all():
     app.create_relationships_to_one("Kruskal and Prim algorithms", "Kruskal's algorithm", "Prim's algorithm")
     app.create_relationships_consecutively("Dijkstra's algorithm to find shortest path",
                                            "Bellman-Ford and Dijkstra algorithms")
-    app.create_relationships_consecutively("Maximum flow - minimum cut theorem", "Max-Flow Min-Cut Theorem")
     app.create_relationships_consecutively("Classical and practical travelling salesman problems",
                                            "Travelling salesman problem")
     app.create_relationships_consecutively("The simplex method", "The simplex algorithm")
     app.create_relationships_consecutively("Gantt charts", "PERT and GANTT charts")
     app.create_relationships_consecutively("Modelling a project", "Project planning and management")
+
+
+def link_d2_uni(app):
+    app.create_relationships_to_one("Definitions and applications", "Linear programming with transportation problems",
+                                    "Linear programming with allocation problems",
+                                    "Converting games to linear programming problems")
+    app.create_relationships_consecutively("Maximum flow - minimum cut theorem", "Max-Flow Min-Cut Theorem")
     app.create_relationships_consecutively("Dynamic programming/A_level", "Dynamic programming")
     app.create_relationships_consecutively("Bellman's principle of optimality", "Bellman-Ford and Dijkstra algorithms")
     app.create_relationships_consecutively("Minimax and maximin problems", "The minimax algorithm and its shortcomings")
@@ -638,63 +946,145 @@ def link_all():
                                     "Optimal strategies for games with no stable solution")
 
 
-def show_compulsory_maths():
-    create_measures_of_location_and_spread_maths()
-    create_statistical_distributions_maths()
-    create_proof_maths()
-    create_probability_maths()
-    create_conditional_probability_maths()
-    create_the_binomial_expansion_maths()
-    create_normal_distribution_a_lvl()
-
-
-def show_compulsory_further_maths():
-    show_compulsory_maths()
-    create_matrices_cp()
-    create_proof_by_induction_cp()
+def show_compulsory_maths(app):
+    create_measures_of_location_and_spread_maths(app)
+    create_statistical_distributions_maths(app)
+    create_proof_maths(app)
+    create_probability_maths(app)
+    create_conditional_probability_maths(app)
+    create_the_binomial_expansion_maths(app)
+    create_normal_distribution_a_lvl(app)
 
 
-def show_uni():
-    create_proof_uni()
-    create_business_studies()
-    create_game_theory_and_game_playing()
-    create_algorithms_uni()
-    create_advanced_algorithms_uni()
-    create_number_theory_uni()
-    create_probability_uni()
-    create_sets_uni()
+def show_compulsory_further_maths(app):
+    show_compulsory_maths(app)
+    create_matrices_cp(app)
+    create_proof_by_induction_cp(app)
 
 
-def show_fp2():
-    create_number_theory_fp2()
-    create_matrix_algebra_fp2()
+def show_uni(app):
+    create_proof_uni(app)
+    create_business_studies(app)
+    create_game_theory_and_game_playing(app)
+    create_algorithms_uni(app)
+    create_advanced_algorithms_uni(app)
+    create_number_theory_uni(app)
+    create_probability_uni(app)
+    create_sets_uni(app)
 
 
-def show_fs1():
-    create_more_distributions_fs1()
-    create_central_limit_theorem_fs1()
-    create_discrete_random_variables_fs1()
+def show_fp2(app):
+    create_number_theory_fp2(app)
+    create_matrix_algebra_fp2(app)
+
 
+def show_fs1(app):
+    create_more_distributions_fs1(app)
+    create_central_limit_theorem_fs1(app)
+    create_discrete_random_variables_fs1(app)
+
+
+def show_fs2(app):
+    create_continuous_distributions_fs2(app)
+
+
+def show_d1(app):
+    create_decision_maths_1(app)
+
+
+def show_d2(app):
+    create_decision_maths_2(app)
+
+
+# curriculum code -> curricula it builds on and the builders that create it
+builders = {
+    "M": {"requires": (), "create": (show_compulsory_maths,)},
+    "CP": {"requires": ("M",), "create": (create_matrices_cp, create_proof_by_induction_cp)},
+    "FP1": {"requires": (), "create": ()},
+    "FP2": {"requires": (), "create": (show_fp2,)},
+    "FS1": {"requires": (), "create": (show_fs1,)},
+    "FS2": {"requires": (), "create": (show_fs2,)},
+    "D1": {"requires": (), "create": (show_d1,)},
+    "D2": {"requires": (), "create": (show_d2,)},
+    "Uni": {"requires": (), "create": (show_uni,)},
+}
+
+# curricula whose nodes a group of relationships joins -> the group
+links = (
+    (("M",), link_maths),
+    (("M", "Uni"), link_maths_uni),
+    (("CP", "Uni"), link_cp_uni),
+    (("FP2", "M"), link_fp2_maths),
+    (("FP2", "Uni"), link_fp2_uni),
+    (("FS1",), link_fs1),
+    (("FS1", "M"), link_fs1_maths),
+    (("FS1", "Uni"), link_fs1_uni),
+    (("FS2", "Uni"), link_fs2_uni),
+    (("Uni",), link_uni),
+    (("D1",), link_d1),
+    (("D1", "Uni"), link_d1_uni),
+    (("D2", "Uni"), link_d2_uni),
+)
+
+
+def resolve(*codes):
+    order = []
+
+    def visit(code):
+        if code not in builders:
+            raise ValueError(f"Unknown curriculum {code}, expected one of {', '.join(builders)}")
+        if code not in order:
+            for required in builders[code]["requires"]:
+                visit(required)
+            order.append(code)
+
+    for code in codes:
+        visit(code)
+
+    return order
+
+
+def load(app, *codes):
+    loaded = resolve(*codes)
+    for code in loaded:
+        for create in builders[code]["create"]:
+            create(app)
+
+    for classes, link in links:
+        if all(cls in loaded for cls in classes):
+            link(app)
 
-def show_fs2():
-    create_continuous_distributions_fs2()
-
-
-def show_d1():
-    create_decision_maths_1()
-
-
-def show_d2():
-    create_decision_maths_2()
+    return loaded
+
+
+def link_all(app):
+    for _, link in links:
+        link(app)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Build the maths graph database for the chosen curricula")
+    parser.add_argument("curricula", nargs = "*", default = ["Uni", "M"],
+                        help = f"curriculum codes to load, from {', '.join(builders)} (default: Uni M)")
+    parser.add_argument("--uri", default = "(your bolt url")
+    parser.add_argument("--user", default = "(your username)")
+    parser.add_argument("--password", default = "(your password)")
+    parser.add_argument("--buffered", action = "store_true", help = "batch writes into grouped statements")
+    parser.add_argument("--batch-size", type = int, default = 1000)
+    parser.add_argument("--flush-interval", type = float, help = "seconds a buffered write may wait before a flush")
+    args = parser.parse_args(argv)
+    try:
+        resolve(*args.curricula)
+    except ValueError as error:
+        parser.error(str(error))
+
+    app = App(args.uri, args.user, args.password, buffered = args.buffered, batch_size = args.batch_size,
+              flush_interval = args.flush_interval)
+    app.delete_all()
+    loaded = load(app, *args.curricula)
+    print(f"Loaded {', '.join(loaded)}")
+    app.close()
 
 
 if __name__ == "__main__":
-    bolt_url = "(your bolt url"
-    user = "(your username)"
-    password = "(your password)"
-    app = App(bolt_url, user, password)
-    app.delete_all()
-    show_uni()
-    show_compulsory_maths()
-    link_all()
-    app.close()
+    main()